@@ -4,14 +4,16 @@ import random
 import math
 import sys
 import os
+import weakref
 
 # --- Constants ---
 # Screen Dimensions
 GAME_WIDTH = 800
 GAME_HEIGHT = 432
 SIZE = (GAME_WIDTH, GAME_HEIGHT)
-screen = pygame.display.set_mode((GAME_WIDTH, GAME_HEIGHT))
 FPS = 60
+MENU_FPS = 30
+PAUSED_FPS = 10
 
 # Box dimensions for menu
 MENU_BOX_WIDTH = GAME_WIDTH * 0.6
@@ -33,7 +35,7 @@ PLAYER_START_HEALTH = 3
 PLAYER_JUMP_VELOCITY = -4
 PLAYER_GRAVITY = 0.2
 PLAYER_LAND_Y = GAME_HEIGHT - PLAYER_HEIGHT
-PLAYER_ANIMATION_SPEED = 0.2
+PLAYER_ANIMATION_FRAMES = 5
 PLAYER_INVINCIBILITY_DURATION = 60
 
 # Obstacle Settings
@@ -41,6 +43,7 @@ OBSTACLE_SCALE_WIDTH = 50
 OBSTACLE_TYPES = ['rock1', 'rock2', 'rock3', 'spikes']
 OBSTACLE_SPAWN_OFFSET_MIN = 0
 OBSTACLE_SPAWN_OFFSET_MAX = 200
+OBSTACLE_SPEED_FACTOR = 2
 
 # Game Settings
 STARTING_SPEED = 5
@@ -52,7 +55,7 @@ SCORE_POS_TOP_MARGIN = 15
 HEALTH_POS_LEFT_MARGIN = 10
 HEALTH_POS_TOP_MARGIN = 10
 HEALTH_HEART_SPACING = 5
-HEART_ANIMATION_SPEED = 0.1
+HEART_ANIMATION_FRAMES = 10
 
 PAUSE_MENU_TITLE_PADDING = 20
 BOX_PADDING_X = 30
@@ -89,11 +92,42 @@ STATE_INSTRUCTIONS = 'INSTRUCTIONS'
 STATE_SETTINGS = 'SETTINGS'
 STATE_GAME_OVER = 'GAME_OVER'
 
+# Frame Rate Per State
+STATE_FRAME_RATES = {
+    STATE_MAIN_MENU: MENU_FPS,
+    STATE_INSTRUCTIONS: MENU_FPS,
+    STATE_SETTINGS: MENU_FPS,
+    STATE_PLAYING: FPS,
+    STATE_PAUSED: PAUSED_FPS,
+    STATE_GAME_OVER: MENU_FPS,
+}
+
+# Events Handled Per State
+EVENT_FILTERS = {
+    STATE_MAIN_MENU: (QUIT, MOUSEBUTTONDOWN, WINDOWEXPOSED),
+    STATE_INSTRUCTIONS: (QUIT, KEYDOWN, MOUSEBUTTONDOWN, WINDOWEXPOSED),
+    STATE_SETTINGS: (QUIT, KEYDOWN, MOUSEBUTTONDOWN, WINDOWEXPOSED),
+    STATE_PLAYING: (QUIT, KEYDOWN),
+    STATE_PAUSED: (QUIT, KEYDOWN, MOUSEBUTTONDOWN, WINDOWEXPOSED),
+    STATE_GAME_OVER: (QUIT, MOUSEBUTTONDOWN, WINDOWEXPOSED),
+}
+
+# Player Actions
+ACTION_RUNNING = 0
+ACTION_JUMPING = 1
+
+# Music States
+MUSIC_STOPPED = 0
+MUSIC_PLAYING = 1
+MUSIC_PAUSED = 2
+
 # --- Pygame Initialization ---
 pygame.init()
 game = pygame.display.set_mode(SIZE)
 pygame.display.set_caption('Pixel Surge')
 clock = pygame.time.Clock()
+pygame.event.set_blocked(None)
+pygame.event.set_allowed(list({event_type for event_types in EVENT_FILTERS.values() for event_type in event_types}))
 
 # Mixer Initialization
 try:
@@ -115,44 +149,53 @@ except pygame.error as e:
 
 # Music Loading
 try:
-    music_paths = [os.path.join(SOUND_DIR, track) for track in MUSIC_TRACKS]
+    music_paths = tuple(os.path.join(SOUND_DIR, track) for track in MUSIC_TRACKS)
     pygame.mixer.music.load(music_paths[0])
     print(f"Loaded music: {music_paths[0]}")
 except pygame.error as e:
     print(f"Error loading music: {e}")
-    music_paths = []
+    music_paths = ()
 
 # --- Game State Variables ---
 game_state = STATE_MAIN_MENU
 score = 0
 speed = 0
-parallax_offsets = []
-heart_sprite_index = 0
+heart_tick = 0
 current_track_index = 0
 music_volume = 0.7
-player = None
-obstacles_group = None
-obstacle = None
+music_state = MUSIC_STOPPED
 quit_game = False
+score_text = None
+score_text_value = None
+score_text_pos = None
+text_surface_cache = weakref.WeakKeyDictionary()
+menu_box_cache = {}
+loaded_fonts = {}
+menu_background = None
+last_frame_key = None
+last_frame_had_events = False
+pause_menu_layout = None
+game_over_layout = None
+settings_layout = None
 
 # --- Helper Functions ---
 def load_scaled_image(path, target_height=None, target_width=None, use_alpha=True):
     try:
         image = pygame.image.load(path)
-        if use_alpha:
-            image = image.convert_alpha()
-        else:
-            image = image.convert()
         if target_height:
             scale = target_height / image.get_height()
-            new_width = image.get_width() * scale
-            new_height = image.get_height() * scale
+            new_width = round(image.get_width() * scale)
+            new_height = round(image.get_height() * scale)
             image = pygame.transform.scale(image, (new_width, new_height))
         elif target_width:
             scale = target_width / image.get_width()
-            new_width = image.get_width() * scale
-            new_height = image.get_height() * scale
+            new_width = round(image.get_width() * scale)
+            new_height = round(image.get_height() * scale)
             image = pygame.transform.scale(image, (new_width, new_height))
+        if use_alpha:
+            image = image.convert_alpha()
+        else:
+            image = image.convert()
         return image
     except pygame.error as e:
         print(f"Error loading or scaling image: {path} - {e}")
@@ -161,50 +204,144 @@ def load_scaled_image(path, target_height=None, target_width=None, use_alpha=Tru
             fallback_size = (50, target_height)
         if target_width:
             fallback_size = (target_width, 50)
-        placeholder = pygame.Surface(fallback_size)
+        placeholder = pygame.Surface(fallback_size).convert()
         placeholder.fill(RED)
         return placeholder
 
-def load_animation_frames(directory, num_frames, target_height):
+def load_animation_frames(directory, prefix, num_frames, target_height):
     frames = []
     for i in range(num_frames):
-        filename = f'run{i}.png' if 'running' in directory else f'jump{i}.png' if 'jumping' in directory else f'heart{i}.png'
-        path = os.path.join(directory, filename)
+        path = os.path.join(directory, f'{prefix}{i}.png')
         frames.append(load_scaled_image(path, target_height=target_height))
     return frames
 
-def draw_text(text, font, color, surface, x, y, center=True, border_color=None):
-    textobj = font.render(text, True, color)
-    textrect = textobj.get_rect()
+def render_text(text, font, color, border_color=None):
+    font_cache = text_surface_cache.get(font)
+    if font_cache is None:
+        font_cache = text_surface_cache[font] = {}
+    key = (text, color, border_color)
+    cached = font_cache.get(key)
+    if cached is None:
+        textobj = font.render(text, True, color)
+        textrect = textobj.get_rect()
+        if border_color:
+            border_text = font.render(text, True, border_color)
+            composite = pygame.Surface((textrect.width + 2, textrect.height + 2), pygame.SRCALPHA)
+            for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
+                composite.blit(border_text, (1 + dx, 1 + dy))
+            textrect.topleft = (1, 1)
+            composite.blit(textobj, textrect)
+            textobj = composite
+        cached = font_cache[key] = (textobj.convert_alpha(), textrect)
+    return cached
+
+def draw_text(text, font, color, surface, x, y, center=True, border_color=None, shadow_color=None):
+    textobj, body_rect = render_text(text, font, color, border_color)
+    textrect = body_rect.copy()
     if center:
         textrect.center = (x, y)
     else:
         textrect.topleft = (x, y)
-    if border_color:
-        for dx, dy in [(-1, 0), (1, 0), (0, -1), (0, 1)]:
-            border_text = font.render(text, True, border_color)
-            border_rect = border_text.get_rect(center=textrect.center)
-            surface.blit(border_text, (border_rect.x + dx, border_rect.y + dy))
-    surface.blit(textobj, textrect)
+    if shadow_color:
+        surface.blit(render_text(text, font, shadow_color)[0], textrect.move(2, 2))
+    surface.blit(textobj, (textrect.x - body_rect.x, textrect.y - body_rect.y))
+
+def build_parallax_strip(layer):
+    layer_width = layer.get_width()
+    strip = pygame.Surface((layer_width + GAME_WIDTH, layer.get_height()), pygame.SRCALPHA)
+    for x in range(0, layer_width + GAME_WIDTH, layer_width):
+        strip.blit(layer, (x, 0), special_flags=BLEND_RGBA_MAX)
+    strip = strip.convert_alpha()
+    # Parallax layers have long fully transparent runs that RLE lets SDL skip when blitting
+    strip.set_alpha(255, RLEACCEL)
+    return strip
+
+def load_obstacle_images():
+    images = []
+    for image_name in OBSTACLE_TYPES:
+        path = os.path.join(OBSTACLE_DIR, f'{image_name}.png')
+        img = load_scaled_image(path, target_width=OBSTACLE_SCALE_WIDTH)
+        if img:
+            images.append(img)
+    if not images:
+        placeholder = pygame.Surface((OBSTACLE_SCALE_WIDTH, 50)).convert()
+        placeholder.fill(RED)
+        images.append(placeholder)
+    return images
+
+def get_font(size):
+    font = loaded_fonts.get(size)
+    if font is None:
+        font = loaded_fonts[size] = pygame.font.Font(FONT_PATH, size)
+    return font
+
+def get_menu_box(width, height):
+    box = menu_box_cache.get((width, height))
+    if box is None:
+        box = pygame.Surface((width, height), pygame.SRCALPHA)
+        box.fill((0, 0, 0, 160))
+        menu_box_cache[(width, height)] = box
+    return box
+
+def play_music():
+    global music_state
+    try:
+        pygame.mixer.music.set_volume(music_volume)
+        pygame.mixer.music.play(-1)
+        music_state = MUSIC_PLAYING
+    except pygame.error as e:
+        print(f"Error playing music: {e}")
+
+def pause_music():
+    global music_state
+    if music_state == MUSIC_PLAYING:
+        try:
+            pygame.mixer.music.pause()
+        except pygame.error as e:
+            print(f"Error pausing music: {e}")
+        music_state = MUSIC_PAUSED
+
+def unpause_music():
+    global music_state
+    if music_state == MUSIC_PAUSED:
+        try:
+            pygame.mixer.music.unpause()
+        except pygame.error as e:
+            print(f"Error unpausing music: {e}")
+        music_state = MUSIC_PLAYING
+
+def stop_music(fade_ms=0):
+    global music_state
+    if music_state != MUSIC_STOPPED:
+        try:
+            if fade_ms:
+                pygame.mixer.music.fadeout(fade_ms)
+            else:
+                pygame.mixer.music.stop()
+        except pygame.error as e:
+            print(f"Error stopping/fading music: {e}")
+        music_state = MUSIC_STOPPED
 
 def switch_music_track(track_index):
-    global current_track_index
+    global current_track_index, music_state
     if track_index != current_track_index and music_paths:
         current_track_index = track_index
+        track_path = music_paths[current_track_index]
         try:
-            pygame.mixer.music.stop()
-            pygame.mixer.music.load(music_paths[current_track_index])
+            pygame.mixer.music.load(track_path)
+            music_state = MUSIC_STOPPED
             pygame.mixer.music.set_volume(music_volume)
             if game_state == STATE_PLAYING:
                 pygame.mixer.music.play(-1)
-            print(f"Switched to music: {music_paths[current_track_index]}")
+                music_state = MUSIC_PLAYING
+            print(f"Switched to music: {track_path}")
         except pygame.error as e:
             print(f"Error switching music to track {track_index}: {e}")
 
 # --- Asset Loading ---
 try:
     sky_image = load_scaled_image(os.path.join(BG_DIR, 'plx-1.png'), use_alpha=False)
-    sky_image = pygame.transform.scale(sky_image, (GAME_WIDTH, GAME_HEIGHT))
+    sky_image = pygame.transform.scale(sky_image, (GAME_WIDTH, GAME_HEIGHT)).convert()
     ground_image = pygame.image.load(os.path.join(BG_DIR, "ground.png")).convert_alpha()
     ground_height = ground_image.get_height()
     background_layers = [
@@ -213,349 +350,385 @@ try:
         load_scaled_image(os.path.join(BG_DIR, 'plx-4.png'), target_height=GAME_HEIGHT),
         load_scaled_image(os.path.join(BG_DIR, 'plx-5.png'), target_height=GAME_HEIGHT)
     ]
-    num_bg_tiles = 1
+    layer_widths = [layer.get_width() for layer in background_layers]
+    layer_scroll_factors = [(i + 10) * 3 for i in range(len(background_layers))]
+    background_strips = [build_parallax_strip(layer) for layer in background_layers]
+    menu_parallax_offsets = (0,) * len(background_layers)
 except Exception as e:
     print(f"Error during background asset loading: {e}")
     sky_image = pygame.Surface(SIZE)
     sky_image.fill(SKY_BLUE)
     background_layers = []
-    num_bg_tiles = 1
+    layer_widths = []
+    layer_scroll_factors = []
+    background_strips = []
+    menu_parallax_offsets = ()
+# Background blits go out in one blits() call; only the strip area rects change per frame
+background_blits = [(sky_image, (0, 0))] + [
+    (strip, (0, GAME_HEIGHT - strip.get_height()), pygame.Rect(0, 0, GAME_WIDTH, strip.get_height()))
+    for strip in background_strips
+]
+background_areas = [blit[2] for blit in background_blits[1:]]
 
 try:
-    heart_sprites = load_animation_frames(HEART_DIR, 8, target_height=30)
+    heart_sprites = load_animation_frames(HEART_DIR, 'heart', 8, target_height=30)
 except Exception as e:
     print(f"Error during heart asset loading: {e}")
     heart_sprites = []
+heart_frame_count = len(heart_sprites)
+heart_positions = []
+if heart_sprites:
+    heart_width = heart_sprites[0].get_width()
+    heart_positions = [(HEALTH_POS_LEFT_MARGIN + life * (heart_width + HEALTH_HEART_SPACING), HEALTH_POS_TOP_MARGIN)
+                       for life in range(PLAYER_START_HEALTH)]
+
+try:
+    player_running_sprites = load_animation_frames(RUNNING_DIR, 'run', 8, PLAYER_HEIGHT)
+    player_jumping_sprites = load_animation_frames(JUMPING_DIR, 'jump', 8, PLAYER_HEIGHT)
+except Exception as e:
+    print(f"FATAL: Could not load player sprites: {e}")
+    dummy_surf = pygame.Surface((50, PLAYER_HEIGHT)).convert()
+    dummy_surf.fill(RED)
+    player_running_sprites = [dummy_surf]
+    player_jumping_sprites = [dummy_surf]
+player_running_masks = [pygame.mask.from_surface(s) for s in player_running_sprites]
+player_jumping_masks = [pygame.mask.from_surface(s) for s in player_jumping_sprites]
+
+# Obstacle images and masks are shared by every Obstacle instance
+obstacle_images = load_obstacle_images()
+obstacle_masks = [pygame.mask.from_surface(img) for img in obstacle_images]
+obstacle_sizes = [img.get_size() for img in obstacle_images]
+obstacle_ys = [GAME_HEIGHT - height for _, height in obstacle_sizes]
 
 # --- Classes ---
 class Player(pygame.sprite.Sprite):
     def __init__(self):
         pygame.sprite.Sprite.__init__(self)
         self.height = PLAYER_HEIGHT
+        self.running_sprites = player_running_sprites
+        self.jumping_sprites = player_jumping_sprites
+        self.running_masks = player_running_masks
+        self.jumping_masks = player_jumping_masks
+        self.running_frame_count = len(self.running_sprites)
+        self.jumping_frame_count = len(self.jumping_sprites)
+        self.rect = self.running_sprites[0].get_rect()
+        self.reset()
+
+    def reset(self):
         self.x = PLAYER_START_X
         self.y = PLAYER_LAND_Y
-        self.action = 'running'
+        self.action = ACTION_RUNNING
         self.health = PLAYER_START_HEALTH
         self.invincibility_frame = 0
         self.vel_y = 0
-        try:
-            self.running_sprites = load_animation_frames(RUNNING_DIR, 8, self.height)
-            self.jumping_sprites = load_animation_frames(JUMPING_DIR, 8, self.height)
-        except Exception as e:
-            print(f"FATAL: Could not load player sprites: {e}")
-            self.running_sprites = []
-            self.jumping_sprites = []
-            dummy_surf = pygame.Surface((50, self.height))
-            dummy_surf.fill(RED)
-            self.running_sprites.append(dummy_surf)
-            self.jumping_sprites.append(dummy_surf)
-        self.running_sprite_index = 0
-        self.jumping_sprite_index = 0
+        self.running_tick = 0
+        self.jumping_tick = 0
         self.current_sprite_list = self.running_sprites
-        self.current_sprite_index = self.running_sprite_index
+        self.current_mask_list = self.running_masks
         self.image = self.current_sprite_list[0]
-        self.rect = self.image.get_rect(topleft=(self.x, self.y))
-        self.mask = pygame.mask.from_surface(self.image)
+        self.rect.topleft = (self.x, self.y)
+        self.mask = self.current_mask_list[0]
 
     def draw(self, surface):
-        if not self.current_sprite_list:
-            return
-        index = int(self.current_sprite_index)
-        index = max(0, min(index, len(self.current_sprite_list) - 1))
-        sprite_to_draw = self.current_sprite_list[index]
-        if self.invincibility_frame > 0:
-            if self.invincibility_frame % 10 < 5:
-                surface.blit(sprite_to_draw, self.rect.topleft)
-        else:
-            surface.blit(sprite_to_draw, self.rect.topleft)
+        if self.invincibility_frame <= 0 or self.invincibility_frame % 10 < 5:
+            surface.blit(self.image, self.rect)
 
     def update(self, dt):
         if not self.running_sprites or not self.jumping_sprites:
             return
-        if self.action == 'jumping':
-            self.y += self.vel_y
+        action = self.action
+        y = self.y
+        if action == ACTION_JUMPING:
+            y += self.vel_y
             self.vel_y += PLAYER_GRAVITY
-            if self.y >= PLAYER_LAND_Y:
-                self.y = PLAYER_LAND_Y
-                self.action = 'running'
+            if y >= PLAYER_LAND_Y:
+                y = PLAYER_LAND_Y
+                action = self.action = ACTION_RUNNING
                 self.vel_y = 0
-        elif self.action == 'running':
-            if self.y < PLAYER_LAND_Y:
-                self.y = PLAYER_LAND_Y
-        if self.action == 'running':
+        elif y < PLAYER_LAND_Y:
+            y = PLAYER_LAND_Y
+        self.y = y
+        if action == ACTION_RUNNING:
             self.current_sprite_list = self.running_sprites
-            self.running_sprite_index = (self.running_sprite_index + PLAYER_ANIMATION_SPEED) % len(self.running_sprites)
-            self.current_sprite_index = self.running_sprite_index
-        elif self.action == 'jumping':
+            self.current_mask_list = self.running_masks
+            tick = self.running_tick = (self.running_tick + 1) % (self.running_frame_count * PLAYER_ANIMATION_FRAMES)
+        else:
             self.current_sprite_list = self.jumping_sprites
-            self.jumping_sprite_index = (self.jumping_sprite_index + PLAYER_ANIMATION_SPEED) % len(self.jumping_sprites)
-            self.current_sprite_index = self.jumping_sprite_index
-        index = int(self.current_sprite_index)
-        index = max(0, min(index, len(self.current_sprite_list) - 1))
+            self.current_mask_list = self.jumping_masks
+            tick = self.jumping_tick = (self.jumping_tick + 1) % (self.jumping_frame_count * PLAYER_ANIMATION_FRAMES)
+        index = tick // PLAYER_ANIMATION_FRAMES
         self.image = self.current_sprite_list[index]
-        self.rect.topleft = (self.x, self.y)
-        self.mask = pygame.mask.from_surface(self.image)
+        self.rect.topleft = (self.x, y)
+        self.mask = self.current_mask_list[index]
         if self.invincibility_frame > 0:
             self.invincibility_frame -= 1
 
     def jump(self):
-        if self.action == 'running':
-            self.action = 'jumping'
+        if self.action == ACTION_RUNNING:
+            self.action = ACTION_JUMPING
             self.vel_y = PLAYER_JUMP_VELOCITY
-            self.jumping_sprite_index = 0
+            self.jumping_tick = 0
 
 class Obstacle(pygame.sprite.Sprite):
     def __init__(self, game_speed):
         pygame.sprite.Sprite.__init__(self)
-        self.obstacle_images = self._load_obstacle_images()
-        if not self.obstacle_images:
-            placeholder = pygame.Surface((OBSTACLE_SCALE_WIDTH, 50))
-            placeholder.fill(RED)
-            self.obstacle_images.append(placeholder)
-        self.image = random.choice(self.obstacle_images)
+        self.obstacle_images = obstacle_images
+        self.obstacle_masks = obstacle_masks
+        self.obstacle_sizes = obstacle_sizes
+        self.obstacle_ys = obstacle_ys
+        image_index = random.randrange(len(self.obstacle_images))
+        self.image = self.obstacle_images[image_index]
         self.game_speed = game_speed
-        self.x = GAME_WIDTH
-        self.y = GAME_HEIGHT - self.image.get_height()
-        self.rect = self.image.get_rect(topleft=(self.x, self.y))
-        self.mask = pygame.mask.from_surface(self.image)
-
-    def _load_obstacle_images(self):
-        images = []
-        for image_name in OBSTACLE_TYPES:
-            path = os.path.join(OBSTACLE_DIR, f'{image_name}.png')
-            img = load_scaled_image(path, target_width=OBSTACLE_SCALE_WIDTH)
-            if img:
-                images.append(img)
-        return images
+        self.y = self.obstacle_ys[image_index]
+        self.rect = pygame.Rect((GAME_WIDTH, self.y), self.obstacle_sizes[image_index])
+        self.x_remainder = 0.0
+        self.mask = self.obstacle_masks[image_index]
 
     def draw(self, surface):
-        surface.blit(self.image, self.rect.topleft)
+        if self.rect.right > 0 and self.rect.left < GAME_WIDTH:
+            surface.blit(self.image, self.rect.topleft)
 
     def update(self, dt):
-        self.x -= (self.game_speed) * dt * FPS
-        self.rect.x = int(self.x)
-
-    def reset(self, game_speed):
-        self.image = random.choice(self.obstacle_images)
-        self.x = GAME_WIDTH + random.randint(OBSTACLE_SPAWN_OFFSET_MIN, OBSTACLE_SPAWN_OFFSET_MAX)
-        self.y = GAME_HEIGHT - self.image.get_height()
-        self.rect = self.image.get_rect(topleft=(self.x, self.y))
-        self.mask = pygame.mask.from_surface(self.image)
+        x_remainder = self.x_remainder + self.game_speed * OBSTACLE_SPEED_FACTOR * dt * FPS
+        step = int(x_remainder)
+        self.x_remainder = x_remainder - step
+        self.rect.x -= step
+
+    def reset(self, game_speed, x=None):
+        image_index = random.randrange(len(self.obstacle_images))
+        self.image = self.obstacle_images[image_index]
+        self.y = self.obstacle_ys[image_index]
+        self.rect.size = self.obstacle_sizes[image_index]
+        if x is None:
+            x = GAME_WIDTH + random.randint(OBSTACLE_SPAWN_OFFSET_MIN, OBSTACLE_SPAWN_OFFSET_MAX)
+        self.rect.topleft = (x, self.y)
+        self.x_remainder = 0.0
+        self.mask = self.obstacle_masks[image_index]
         self.game_speed = game_speed
 
+# The player, obstacle and parallax offsets live for the whole session and are reset between runs
+player = Player()
+obstacle = Obstacle(STARTING_SPEED)
+parallax_offsets = [0] * len(background_layers)
+
 # --- Game Logic Functions ---
 def reset_game():
-    global player, obstacles_group, obstacle, score, speed, parallax_offsets, heart_sprite_index
+    global score, speed, heart_tick
     score = 0
     speed = STARTING_SPEED
-    player = Player()
-    obstacles_group = pygame.sprite.Group()
-    obstacle = Obstacle(speed)
-    obstacles_group.add(obstacle)
-    parallax_offsets = [0] * len(background_layers)
-    heart_sprite_index = 0
-    player.invincibility_frame = 0
+    player.reset()
+    obstacle.reset(speed, GAME_WIDTH)
+    parallax_offsets[:] = menu_parallax_offsets
+    heart_tick = 0
 
 def draw_ground(surface, ground_img):
     surface.blit(ground_img, (0, GAME_HEIGHT - ground_height))
 
-def draw_layered_background(surface, sky, layers, offsets, num_tiles):
-    surface.blit(sky, (0, 0))
-    for i in range(len(layers)):
-        if i < len(offsets):
-            layer = layers[i]
-            offset = offsets[i]
-            pos_y = GAME_HEIGHT - layer.get_height()
-            layer_width = layer.get_width()
-            start_x = int(offset % layer_width) - layer_width
-            for j in range(num_tiles + 2):
-                pos_x = start_x + j * layer_width
-                surface.blit(layer, (pos_x, pos_y))
-
-def update_parallax(offsets, layers, current_speed, dt):
-    new_offsets = []
-    for i in range(len(layers)):
-        if i < len(offsets):
-            scroll_amount = (i + 10) * current_speed * 3 * dt
-            layer_width = layers[i].get_width()
-            new_offset = offsets[i] - scroll_amount
-            if new_offset <= -layer_width:
-                new_offset += layer_width
-            new_offsets.append(new_offset)
-        else:
-            new_offsets.append(0)
-    return new_offsets
+def draw_layered_background(surface, blit_list, areas, widths, offsets):
+    for area, layer_width, offset in zip(areas, widths, offsets):
+        area.x = -int(offset % layer_width) % layer_width
+    surface.blits(blit_list, doreturn=False)
+
+def update_and_draw_background(surface, blit_list, areas, widths, offsets, factors, current_speed, dt):
+    distance = current_speed * dt
+    for i, area in enumerate(areas):
+        layer_width = widths[i]
+        new_offset = offsets[i] - factors[i] * distance
+        if new_offset <= -layer_width:
+            new_offset += layer_width
+        offsets[i] = new_offset
+        area.x = -int(new_offset % layer_width) % layer_width
+    surface.blits(blit_list, doreturn=False)
 
 # --- Menu Drawing Functions ---
 def draw_menu_background(surface):
-    draw_layered_background(surface, sky_image, background_layers, [0]*len(background_layers), num_bg_tiles)
+    global menu_background
+    if menu_background is None:
+        menu_background = pygame.Surface(SIZE).convert()
+        draw_layered_background(menu_background, background_blits, background_areas, layer_widths, menu_parallax_offsets)
+    surface.blit(menu_background, (0, 0))
+
+main_menu_buttons = {
+    "start": pygame.Rect(GAME_WIDTH / 2 - 100, GAME_HEIGHT / 2 - 30, 200, 50),
+    "how to play": pygame.Rect(GAME_WIDTH / 2 - 100, GAME_HEIGHT / 2 + 30, 200, 50),
+    "settings": pygame.Rect(GAME_WIDTH / 2 - 100, GAME_HEIGHT / 2 + 90, 200, 50),
+    "quit": pygame.Rect(GAME_WIDTH / 2 - 100, GAME_HEIGHT / 2 + 150, 200, 50)
+}
+main_menu_labels = [(name.replace('_', ' ').title(), rect) for name, rect in main_menu_buttons.items()]
 
 def draw_main_menu(surface):
     draw_menu_background(surface)
-    title_font = pygame.font.Font(FONT_PATH, 72)
-    draw_text('Pixel Surge', title_font, TEXT_SHADOW, surface, GAME_WIDTH / 2 + 2, GAME_HEIGHT / 4 + 2)
-    draw_text('Pixel Surge', title_font, WHITE, surface, GAME_WIDTH / 2, GAME_HEIGHT / 4)
-    button_rects = {
-        "start": pygame.Rect(GAME_WIDTH / 2 - 100, GAME_HEIGHT / 2 - 30, 200, 50),
-        "how to play": pygame.Rect(GAME_WIDTH / 2 - 100, GAME_HEIGHT / 2 + 30, 200, 50),
-        "settings": pygame.Rect(GAME_WIDTH / 2 - 100, GAME_HEIGHT / 2 + 90, 200, 50),
-        "quit": pygame.Rect(GAME_WIDTH / 2 - 100, GAME_HEIGHT / 2 + 150, 200, 50)
-    }
+    draw_text('Pixel Surge', get_font(72), WHITE, surface, GAME_WIDTH / 2, GAME_HEIGHT / 4, shadow_color=TEXT_SHADOW)
     mouse_pos = pygame.mouse.get_pos()
-    for name, rect in button_rects.items():
-        text = name.replace('_', ' ').title()
+    for text, rect in main_menu_labels:
         is_hovered = rect.collidepoint(mouse_pos)
         size = BASE_FONT_SIZE + 8 if is_hovered else BASE_FONT_SIZE
-        font = pygame.font.Font(FONT_PATH, size)
-        draw_text(text, font, TEXT_SHADOW, surface, rect.centerx + 2, rect.centery + 2)
-        draw_text(text, font, TEXT_HOVER if is_hovered else WHITE, surface, rect.centerx, rect.centery)
-    return button_rects
+        font = get_font(size)
+        draw_text(text, font, TEXT_HOVER if is_hovered else WHITE, surface, rect.centerx, rect.centery, shadow_color=TEXT_SHADOW)
+    return main_menu_buttons
+
+def get_pause_menu_layout():
+    global pause_menu_layout
+    if pause_menu_layout is None:
+        PAUSE_MENU_BOX_HEIGHT = 300
+        button_height = 50
+        title_font = get_font(60)
+        box_y = (GAME_HEIGHT - PAUSE_MENU_BOX_HEIGHT) / 2
+        button_rects = {}
+        current_button_y = box_y + title_font.get_height() + PAUSE_MENU_TITLE_PADDING + BOX_PADDING_Y
+        button_x = GAME_WIDTH / 2 - 100
+        for text in ["Resume", "Main Menu", "Quit"]:
+            button_rects[text.lower()] = pygame.Rect(button_x, current_button_y, 200, button_height)
+            current_button_y += button_height + BUTTON_SPACING_Y
+        pause_menu_layout = {
+            "title_font": title_font,
+            "title_y": box_y + BOX_PADDING_Y,
+            "button_font": get_font(BASE_FONT_SIZE),
+            "hover_font": get_font(HOVER_FONT_SIZE),
+            "buttons": button_rects
+        }
+    return pause_menu_layout
 
 def draw_pause_menu(surface):
     draw_menu_background(surface)
-    PAUSE_MENU_BOX_WIDTH = 300
-    PAUSE_MENU_BOX_HEIGHT = 300
-    title_text = 'Paused'
-    button_texts_list = ["Resume", "Main Menu", "Quit"]
-    button_height = 50
-    num_buttons = len(button_texts_list)
-    title_font_size = 60
-    button_font_size = BASE_FONT_SIZE
-    title_font = pygame.font.Font(FONT_PATH, title_font_size)
-    button_font = pygame.font.Font(FONT_PATH, button_font_size)
-    title_height = title_font.get_height()
-    buttons_total_height = num_buttons * button_height + (num_buttons - 1) * BUTTON_SPACING_Y
-    content_height = title_height + buttons_total_height + BOX_PADDING_Y * 3
-    box_width = PAUSE_MENU_BOX_WIDTH
-    box_height = PAUSE_MENU_BOX_HEIGHT
-    box_x = (GAME_WIDTH - box_width) / 2
-    box_y = (GAME_HEIGHT - box_height) / 2
+    layout = get_pause_menu_layout()
     mouse_pos = pygame.mouse.get_pos()
-    draw_text(title_text, title_font, TEXT_SHADOW, surface, GAME_WIDTH / 2 + 2, box_y + BOX_PADDING_Y + 2)
-    draw_text(title_text, title_font, (255, 153, 51), surface, GAME_WIDTH / 2, box_y + BOX_PADDING_Y)
-    button_rects = {}
-    current_button_y = box_y + title_height + PAUSE_MENU_TITLE_PADDING + BOX_PADDING_Y
-    button_x = GAME_WIDTH / 2 - 100
-    for text in button_texts_list:
-        rect = pygame.Rect(button_x, current_button_y, 200, button_height)
-        button_rects[text.lower()] = rect
+    draw_text('Paused', layout["title_font"], (255, 153, 51), surface, GAME_WIDTH / 2, layout["title_y"], shadow_color=TEXT_SHADOW)
+    for key, rect in layout["buttons"].items():
         is_hovered = rect.collidepoint(mouse_pos)
-        size = HOVER_FONT_SIZE if is_hovered else button_font_size
-        font = pygame.font.Font(FONT_PATH, size)
-        draw_text(text, font, TEXT_SHADOW, surface, rect.centerx + 2, rect.centery + 2)
-        draw_text(text, font, TEXT_HOVER if is_hovered else WHITE, surface, rect.centerx, rect.centery)
-        current_button_y += button_height + BUTTON_SPACING_Y
-    return button_rects
+        font = layout["hover_font"] if is_hovered else layout["button_font"]
+        draw_text(key.title(), font, TEXT_HOVER if is_hovered else WHITE, surface, rect.centerx, rect.centery, shadow_color=TEXT_SHADOW)
+    return layout["buttons"]
+
+instructions_buttons = {"back": pygame.Rect(GAME_WIDTH / 2 - 100, GAME_HEIGHT * 0.75, 200, 50)}
 
 def draw_instructions_screen(surface):
     draw_menu_background(surface)
-    PAUSE_MENU_BOX_WIDTH = 200
-    PAUSE_MENU_BOX_HEIGHT = 300
     draw_text('How to play', menu_font, WHITE, surface, GAME_WIDTH / 2, GAME_HEIGHT / 3.5, border_color=BLACK)
     draw_text('Press SPACE to jump over obstacles.', button_font, WHITE, surface, GAME_WIDTH / 2, GAME_HEIGHT / 2 - 40, border_color=BLACK)
     draw_text('Avoid rocks and spikes!', button_font, WHITE, surface, GAME_WIDTH / 2, GAME_HEIGHT / 2, border_color=BLACK)
     draw_text('Press ESC to pause.', button_font, WHITE, surface, GAME_WIDTH / 2, GAME_HEIGHT / 2 + 40, border_color=BLACK)
-    button_back = pygame.Rect(GAME_WIDTH / 2 - 100, GAME_HEIGHT * 0.75, 200, 50)
+    button_back = instructions_buttons["back"]
     pygame.draw.rect(surface, TEXT_HOVER, button_back)
     draw_text('Back', button_font, WHITE, surface, button_back.centerx, button_back.centery)
-    return {"back": button_back}
+    return instructions_buttons
+
+def get_settings_layout():
+    global settings_layout
+    if settings_layout is None:
+        box_width = GAME_WIDTH * 0.6
+        box_height = GAME_HEIGHT * 0.6
+        box_x = (GAME_WIDTH - box_width) / 2
+        box_y = (GAME_HEIGHT - box_height) / 2
+        volume_y = box_y + BOX_PADDING_Y + menu_font.get_height() + BOX_PADDING_Y
+        volume_minus_rect = pygame.Rect(GAME_WIDTH / 2 - 120, volume_y + 20, 50, 40)
+        volume_plus_rect = pygame.Rect(GAME_WIDTH / 2 + 70, volume_y + 20, 50, 40)
+        track_y = volume_y + 80
+        track_rects = []
+        for i in range(len(MUSIC_TRACK_NAMES)):
+            x_offset = -100 if i == 0 else 50
+            track_rects.append(pygame.Rect(GAME_WIDTH / 2 + x_offset, track_y + 20, 100, 40))
+        back_rect = pygame.Rect(GAME_WIDTH / 2 - 100, box_y + box_height - 60, 200, 50)
+        settings_layout = {
+            "box": get_menu_box(box_width, box_height),
+            "box_pos": (box_x, box_y),
+            "title_y": box_y + BOX_PADDING_Y,
+            "volume_y": volume_y,
+            "volume_labels": ((volume_minus_rect, '-'), (volume_plus_rect, '+')),
+            "track_y": track_y,
+            "track_rects": track_rects,
+            "buttons": {
+                "volume_minus": volume_minus_rect,
+                "volume_plus": volume_plus_rect,
+                "back": back_rect,
+                **{f"track_{i}": rect for i, rect in enumerate(track_rects)}
+            }
+        }
+    return settings_layout
 
 def draw_settings_screen(surface):
     draw_menu_background(surface)
-    box_width = GAME_WIDTH * 0.6
-    box_height = GAME_HEIGHT * 0.6
-    text_box = pygame.Surface((box_width, box_height), pygame.SRCALPHA)
-    text_box.fill((0, 0, 0, 160))
-    box_x = (GAME_WIDTH - box_width) / 2
-    box_y = (GAME_HEIGHT - box_height) / 2
-    surface.blit(text_box, (box_x, box_y))
-    draw_text('Settings', menu_font, WHITE, surface, GAME_WIDTH / 2, box_y + BOX_PADDING_Y)
-    volume_y = box_y + BOX_PADDING_Y + menu_font.get_height() + BOX_PADDING_Y
-    draw_text(f'Volume: {int(music_volume * 100)}%', button_font, WHITE, surface, GAME_WIDTH / 2, volume_y)
-    volume_minus_rect = pygame.Rect(GAME_WIDTH / 2 - 120, volume_y + 20, 50, 40)
-    volume_plus_rect = pygame.Rect(GAME_WIDTH / 2 + 70, volume_y + 20, 50, 40)
+    layout = get_settings_layout()
+    surface.blit(layout["box"], layout["box_pos"])
+    draw_text('Settings', menu_font, WHITE, surface, GAME_WIDTH / 2, layout["title_y"])
+    draw_text(f'Volume: {int(music_volume * 100)}%', button_font, WHITE, surface, GAME_WIDTH / 2, layout["volume_y"])
     mouse_pos = pygame.mouse.get_pos()
-    for rect, text in [(volume_minus_rect, '-'), (volume_plus_rect, '+')]:
+    for rect, text in layout["volume_labels"]:
         is_hovered = rect.collidepoint(mouse_pos)
         font_size = HOVER_FONT_SIZE if is_hovered else BUTTON_FONT_SIZE
-        font = pygame.font.Font(FONT_PATH, font_size)
+        font = get_font(font_size)
         draw_text(text, font, TEXT_HOVER if is_hovered else WHITE, surface, rect.centerx, rect.centery)
-    track_y = volume_y + 80
-    draw_text('Music Track', button_font, WHITE, surface, GAME_WIDTH / 2, track_y)
-    track_rects = {}
-    for i, track_name in enumerate(MUSIC_TRACK_NAMES):
-        x_offset = -100 if i == 0 else 50
-        rect = pygame.Rect(GAME_WIDTH / 2 + x_offset, track_y + 20, 100, 40)
-        track_rects[i] = rect
+    draw_text('Music Track', button_font, WHITE, surface, GAME_WIDTH / 2, layout["track_y"])
+    for i, (track_name, rect) in enumerate(zip(MUSIC_TRACK_NAMES, layout["track_rects"])):
         is_hovered = rect.collidepoint(mouse_pos)
         font_size = HOVER_FONT_SIZE if is_hovered else BUTTON_FONT_SIZE
-        font = pygame.font.Font(FONT_PATH, font_size)
+        font = get_font(font_size)
         color = TEXT_HOVER if is_hovered or i == current_track_index else WHITE
         draw_text(track_name, font, color, surface, rect.centerx, rect.centery)
-    back_rect = pygame.Rect(GAME_WIDTH / 2 - 100, box_y + box_height - 60, 200, 50)
+    back_rect = layout["buttons"]["back"]
     is_hovered = back_rect.collidepoint(mouse_pos)
     font_size = HOVER_FONT_SIZE if is_hovered else BUTTON_FONT_SIZE
-    font = pygame.font.Font(FONT_PATH, font_size)
+    font = get_font(font_size)
     draw_text('Back', font, TEXT_HOVER if is_hovered else WHITE, surface, back_rect.centerx, back_rect.centery)
-    return {
-        "volume_minus": volume_minus_rect,
-        "volume_plus": volume_plus_rect,
-        "back": back_rect,
-        **{f"track_{i}": rect for i, rect in track_rects.items()}
-    }
+    return layout["buttons"]
+
+def get_game_over_layout():
+    global game_over_layout
+    if game_over_layout is None:
+        button_height = 50
+        num_buttons = 2
+        title_height = menu_font.get_height()
+        score_text_height = button_font.get_height()
+        buttons_total_height = num_buttons * button_height + (num_buttons - 1) * BUTTON_SPACING_Y
+        content_height = title_height + score_text_height + buttons_total_height + BOX_PADDING_Y * 4
+        box_width = GAME_WIDTH * 0.6
+        box_height = content_height
+        box_x = (GAME_WIDTH - box_width) / 2
+        box_y = (GAME_HEIGHT - box_height) / 2
+        title_y = box_y + BOX_PADDING_Y
+        score_text_y = title_y + title_height + BOX_PADDING_Y
+        button_rects = {}
+        current_button_y = score_text_y + score_text_height + BOX_PADDING_Y
+        button_x = GAME_WIDTH / 2 - 100
+        for key in ["retry", "menu"]:
+            button_rects[key] = pygame.Rect(button_x, current_button_y, 200, button_height)
+            current_button_y += button_height + BUTTON_SPACING_Y
+        game_over_layout = {
+            "box": get_menu_box(box_width, box_height),
+            "box_pos": (box_x, box_y),
+            "title_y": title_y + title_height / 2,
+            "score_y": score_text_y + score_text_height / 2,
+            "buttons": button_rects
+        }
+    return game_over_layout
 
 def draw_game_over_screen(surface, current_score):
     draw_menu_background(surface)
-    title_text = 'Game Over!'
-    score_text = f'Final Score: {current_score}'
-    button_texts_list = ["Retry", "Main Menu"]
-    button_height = 50
-    num_buttons = len(button_texts_list)
-    title_height = menu_font.get_height()
-    score_text_height = button_font.get_height()
-    buttons_total_height = num_buttons * button_height + (num_buttons - 1) * BUTTON_SPACING_Y
-    content_height = title_height + score_text_height + buttons_total_height + BOX_PADDING_Y * 4
-    box_width = GAME_WIDTH * 0.6
-    box_height = content_height
-    box_x = (GAME_WIDTH - box_width) / 2
-    box_y = (GAME_HEIGHT - box_height) / 2
-    menu_box = pygame.Surface((box_width, box_height), pygame.SRCALPHA)
-    menu_box.fill((0, 0, 0, 160))
-    surface.blit(menu_box, (box_x, box_y))
-    title_y = box_y + BOX_PADDING_Y
-    draw_text(title_text, menu_font, RED, surface, GAME_WIDTH / 2, title_y + title_height / 2)
-    score_text_y = title_y + title_height + BOX_PADDING_Y
-    draw_text(score_text, button_font, WHITE, surface, GAME_WIDTH / 2, score_text_y + score_text_height / 2)
-    button_rects = {}
-    current_button_y = score_text_y + score_text_height + BOX_PADDING_Y
-    button_x = GAME_WIDTH / 2 - 100
-    button_keys = ["retry", "menu"]
-    for i, text in enumerate(button_texts_list):
-        key = button_keys[i]
-        rect = pygame.Rect(button_x, current_button_y, 200, button_height)
-        button_rects[key] = rect
+    layout = get_game_over_layout()
+    surface.blit(layout["box"], layout["box_pos"])
+    draw_text('Game Over!', menu_font, RED, surface, GAME_WIDTH / 2, layout["title_y"])
+    draw_text(f'Final Score: {current_score}', button_font, WHITE, surface, GAME_WIDTH / 2, layout["score_y"])
+    for text, rect in zip(["Retry", "Main Menu"], layout["buttons"].values()):
         pygame.draw.rect(surface, WHITE, rect)
         draw_text(text, button_font, BLACK, surface, rect.centerx, rect.centery)
-        current_button_y += button_height + BUTTON_SPACING_Y
-    return button_rects
+    return layout["buttons"]
 
 def draw_hud(surface, current_score, current_health):
-    global heart_sprite_index
+    global heart_tick, score_text, score_text_value, score_text_pos
     if heart_sprites:
-        heart_sprite_index = (heart_sprite_index + HEART_ANIMATION_SPEED) % len(heart_sprites)
-        current_heart_sprite = heart_sprites[int(heart_sprite_index)]
-        heart_width = current_heart_sprite.get_width()
-        for life in range(current_health):
-            x_pos = HEALTH_POS_LEFT_MARGIN + life * (heart_width + HEALTH_HEART_SPACING)
-            surface.blit(current_heart_sprite, (x_pos, HEALTH_POS_TOP_MARGIN))
+        heart_tick = (heart_tick + 1) % (heart_frame_count * HEART_ANIMATION_FRAMES)
+        current_heart_sprite = heart_sprites[heart_tick // HEART_ANIMATION_FRAMES]
+        surface.blits([(current_heart_sprite, pos) for pos in heart_positions[:current_health]], doreturn=False)
     else:
         draw_text(f'Health: {current_health}', score_font, BLACK, surface, HEALTH_POS_LEFT_MARGIN, HEALTH_POS_TOP_MARGIN, center=False)
-    score_text = score_font.render(f'Score: {current_score}', True, BLACK)
-    score_rect = score_text.get_rect(topright=(GAME_WIDTH - SCORE_POS_RIGHT_MARGIN, SCORE_POS_TOP_MARGIN))
-    surface.blit(score_text, score_rect)
+    if current_score != score_text_value:
+        score_text = score_font.render(f'Score: {current_score}', True, BLACK)
+        score_text_value = current_score
+        score_text_pos = score_text.get_rect(topright=(GAME_WIDTH - SCORE_POS_RIGHT_MARGIN, SCORE_POS_TOP_MARGIN)).topleft
+    surface.blit(score_text, score_text_pos)
 
 # --- State Handling Functions ---
-def handle_main_menu(events):
+def handle_main_menu(events, dt):
     global game_state, quit_game
     buttons = draw_main_menu(game)
     for event in events:
@@ -564,13 +737,7 @@ def handle_main_menu(events):
             if buttons["start"].collidepoint(mouse_pos):
                 reset_game()
                 game_state = STATE_PLAYING
-                try:
-                    pygame.mixer.music.stop()
-                    pygame.mixer.music.load(music_paths[current_track_index])
-                    pygame.mixer.music.set_volume(music_volume)
-                    pygame.mixer.music.play(-1)
-                except pygame.error as e:
-                    print(f"Error playing music: {e}")
+                play_music()
             elif buttons["how to play"].collidepoint(mouse_pos):
                 game_state = STATE_INSTRUCTIONS
             elif buttons["settings"].collidepoint(mouse_pos):
@@ -578,7 +745,7 @@ def handle_main_menu(events):
             elif buttons["quit"].collidepoint(mouse_pos):
                 quit_game = True
 
-def handle_instructions(events):
+def handle_instructions(events, dt):
     global game_state
     buttons = draw_instructions_screen(game)
     for event in events:
@@ -588,7 +755,7 @@ def handle_instructions(events):
         elif event.type == KEYDOWN and event.key == K_ESCAPE:
             game_state = STATE_MAIN_MENU
 
-def handle_settings(events):
+def handle_settings(events, dt):
     global game_state, music_volume, current_track_index
     buttons = draw_settings_screen(game)
     for event in events:
@@ -610,83 +777,58 @@ def handle_settings(events):
             game_state = STATE_MAIN_MENU
 
 def handle_playing(events, dt):
-    global game_state, score, speed, obstacle, parallax_offsets
+    global game_state, score, speed
     for event in events:
         if event.type == KEYDOWN:
             if event.key == K_SPACE:
                 player.jump()
             if event.key == K_ESCAPE:
                 game_state = STATE_PAUSED
-                try:
-                    pygame.mixer.music.pause()
-                except pygame.error as e:
-                    print(f"Error pausing music: {e}")
+                pause_music()
     player.update(dt)
     obstacle.update(dt)
-    obstacles_group.update(dt)
-    parallax_offsets = update_parallax(parallax_offsets, background_layers, speed, dt)
     if obstacle.rect.right < 0:
         score += 1
         if score % SPEED_INCREASE_INTERVAL == 0 and speed < MAX_SPEED:
             speed = min(MAX_SPEED, speed + SPEED_INCREASE_AMOUNT)
-        obstacles_group.remove(obstacle)
-        obstacle = Obstacle(speed)
-        obstacles_group.add(obstacle)
-    if player.invincibility_frame <= 0:
-        collided_obstacles = pygame.sprite.spritecollide(player, obstacles_group, False, pygame.sprite.collide_mask)
-        if collided_obstacles:
-            collided_obstacle = collided_obstacles[0]
+        obstacle.reset(speed, GAME_WIDTH)
+    if player.invincibility_frame <= 0 and player.rect.colliderect(obstacle.rect):
+        offset = (obstacle.rect.x - player.rect.x, obstacle.rect.y - player.rect.y)
+        if player.mask.overlap(obstacle.mask, offset):
             player.health -= 1
             player.invincibility_frame = PLAYER_INVINCIBILITY_DURATION
-            obstacles_group.remove(collided_obstacle)
-            obstacle = Obstacle(speed)
-            obstacles_group.add(obstacle)
+            obstacle.reset(speed, GAME_WIDTH)
             if player.health <= 0:
                 game_state = STATE_GAME_OVER
-                try:
-                    pygame.mixer.music.fadeout(500)
-                except pygame.error as e:
-                    print(f"Error stopping/fading music: {e}")
-    draw_layered_background(game, sky_image, background_layers, parallax_offsets, num_bg_tiles)
+                stop_music(500)
+    update_and_draw_background(game, background_blits, background_areas, layer_widths, parallax_offsets, layer_scroll_factors, speed, dt)
     player.draw(game)
-    obstacles_group.draw(game)
+    obstacle.draw(game)
     draw_hud(game, score, player.health)
 
-def handle_pause(events):
+def handle_pause(events, dt):
     global game_state, quit_game
     buttons = draw_pause_menu(game)
     for event in events:
         if event.type == KEYDOWN and event.key == K_ESCAPE:
             game_state = STATE_PLAYING
-            try:
-                pygame.mixer.music.unpause()
-            except pygame.error as e:
-                print(f"Error unpausing music: {e}")
+            unpause_music()
         elif event.type == MOUSEBUTTONDOWN and event.button == 1:
             mouse_pos = event.pos
             for key, rect in buttons.items():
                 if rect.collidepoint(mouse_pos):
                     if key == "resume":
                         game_state = STATE_PLAYING
-                        try:
-                            pygame.mixer.music.unpause()
-                        except pygame.error as e:
-                            print(f"Error unpausing music: {e}")
+                        unpause_music()
                     elif key == "main menu":
                         game_state = STATE_MAIN_MENU
-                        try:
-                            pygame.mixer.music.stop()
-                        except pygame.error as e:
-                            print(f"Error stopping music: {e}")
+                        stop_music()
                     elif key == "quit":
-                        try:
-                            pygame.mixer.music.stop()
-                        except pygame.error as e:
-                            print(f"Error stopping music: {e}")
+                        stop_music()
                         quit_game = True
                     break
 
-def handle_game_over(events):
+def handle_game_over(events, dt):
     global game_state
     buttons = draw_game_over_screen(game, score)
     for event in events:
@@ -695,41 +837,37 @@ def handle_game_over(events):
             if buttons["retry"].collidepoint(mouse_pos):
                 reset_game()
                 game_state = STATE_PLAYING
-                try:
-                    pygame.mixer.music.stop()
-                    pygame.mixer.music.load(music_paths[current_track_index])
-                    pygame.mixer.music.set_volume(music_volume)
-                    pygame.mixer.music.play(-1)
-                except pygame.error as e:
-                    print(f"Error playing music: {e}")
+                play_music()
             elif buttons["menu"].collidepoint(mouse_pos):
                 game_state = STATE_MAIN_MENU
 
+STATE_HANDLERS = {
+    STATE_MAIN_MENU: handle_main_menu,
+    STATE_INSTRUCTIONS: handle_instructions,
+    STATE_SETTINGS: handle_settings,
+    STATE_PLAYING: handle_playing,
+    STATE_PAUSED: handle_pause,
+    STATE_GAME_OVER: handle_game_over,
+}
+
 # --- Main Game Loop ---
 while not quit_game:
-    dt = clock.tick(FPS) / 1000.0
-    events = pygame.event.get()
+    dt = clock.tick(STATE_FRAME_RATES[game_state]) / 1000.0
+    events = pygame.event.get(EVENT_FILTERS[game_state])
+    pygame.event.clear(pump=False)
     for event in events:
         if event.type == QUIT:
             quit_game = True
-    if game_state == STATE_MAIN_MENU:
-        handle_main_menu(events)
-    elif game_state == STATE_INSTRUCTIONS:
-        handle_instructions(events)
-    elif game_state == STATE_SETTINGS:
-        handle_settings(events)
-    elif game_state == STATE_PLAYING:
-        handle_playing(events, dt)
-    elif game_state == STATE_PAUSED:
-        handle_pause(events)
-    elif game_state == STATE_GAME_OVER:
-        handle_game_over(events)
-    pygame.display.update()
+    frame_key = (game_state, pygame.mouse.get_pos())
+    # Menu screens only change on input or hover, so an idle frame is neither redrawn nor presented.
+    # Handlers draw before acting on their events, so the frame after any input still runs the handler.
+    if frame_key[0] == STATE_PLAYING or events or last_frame_had_events or frame_key != last_frame_key:
+        STATE_HANDLERS[game_state](events, dt)
+        pygame.display.update()
+    last_frame_key = frame_key
+    last_frame_had_events = bool(events)
 
 # --- Cleanup ---
-try:
-    pygame.mixer.music.stop()
-except pygame.error:
-    pass
+stop_music()
 pygame.quit()
 sys.exit()
\ No newline at end of file